@@ -1,3 +1,3 @@
 # Инициализация модуля data_management
 from .import_data import import_data
-from .update_schema import add_column_if_not_exists
+from .update_schema import add_column_if_not_exists, migrate_lookup_columns, add_missing_columns, backfill_import_stats
@@ -7,40 +7,102 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import models
+from generation import bump_generation
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-import random
+import heapq
 
-def assign_processes():
-    """Назначает процессы случайным владельцам"""
-    db = SessionLocal()
-    try:
-        # Получаем всех владельцев
-        owners = db.query(models.Owner).all()
-        if not owners:
-            print("Ошибка: нет владельцев в базе данных")
-            return
-
-        # Получаем все процессы
-        processes = db.query(models.Process).all()
-        if not processes:
-            print("Ошибка: нет процессов в базе данных")
-            return
-
-        # Распределяем процессы между владельцами
-        for process in processes:
-            # Выбираем случайного владельца
-            owner = random.choice(owners)
-            process.owner_id = owner.id
-            print(f"Процесс '{process.name}' назначен владельцу {owner.full_name}")
+BALANCE_MODES = ("count", "rating")
+# Ограничение на число параметров в одном UPDATE ... WHERE id IN (...)
+UPDATE_CHUNK_SIZE = 500
+
+def plan_assignments(processes, owner_ids, by: str = "count") -> dict:
+    """Распределяет процессы между владельцами жадным алгоритмом на куче.
+
+    processes — пары (id процесса, рейтинг). Каждый процесс достается владельцу
+    с наименьшей текущей нагрузкой: числом процессов (by="count") или суммой
+    рейтингов (by="rating"; процессы берутся по убыванию рейтинга).
+    Импорт пока не заполняет рейтинг процессов (в отчетах нет колонки 'Рейтинг'),
+    и при нулевых рейтингах by="rating" совпадает с by="count".
+    Возвращает словарь {id владельца: [id процессов]}.
+    """
+    if by not in BALANCE_MODES:
+        raise ValueError(f"Неизвестный способ балансировки: {by}")
+    if by == "rating":
+        processes = sorted(processes, key=lambda p: p[1] or 0.0, reverse=True)
+
+    plan = {owner_id: [] for owner_id in owner_ids}
+    # (нагрузка, число процессов, id владельца) — при равенстве побеждает меньший id
+    heap = [(0.0, 0, owner_id) for owner_id in sorted(plan)]
+    heapq.heapify(heap)
+    for process_id, rating in processes:
+        load, count, owner_id = heap[0]
+        plan[owner_id].append(process_id)
+        weight = (rating or 0.0) if by == "rating" else 1
+        heapq.heapreplace(heap, (load + weight, count + 1, owner_id))
+    return plan
+
+def balance_assignments(db: Session, by: str = "count") -> list:
+    """Перераспределяет все процессы между владельцами в одной транзакции.
+
+    Возвращает сводку по владельцам: число процессов и суммарный рейтинг.
+    """
+    owner_ids = [owner_id for (owner_id,) in db.query(models.Owner.id)]
+    if not owner_ids:
+        raise ValueError("Нет владельцев в базе данных")
+    processes = db.query(models.Process.id, models.Process.rating).all()
+    if not processes:
+        raise ValueError("Нет процессов в базе данных")
 
+    plan = plan_assignments(processes, owner_ids, by)
+    ratings = dict(processes)
+    try:
+        for owner_id, process_ids in plan.items():
+            for start in range(0, len(process_ids), UPDATE_CHUNK_SIZE):
+                db.execute(
+                    update(models.Process)
+                    .where(models.Process.id.in_(process_ids[start:start + UPDATE_CHUNK_SIZE]))
+                    .values(owner_id=owner_id)
+                    .execution_options(synchronize_session=False)
+                )
+        # Кэши, построенные по владельцам, должны перестроиться
+        bump_generation(db)
         db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return [
+        {
+            "owner_id": owner_id,
+            "process_count": len(process_ids),
+            "total_rating": sum(ratings[p] or 0.0 for p in process_ids),
+        }
+        for owner_id, process_ids in plan.items()
+    ]
+
+def assign_processes(by: str = "count"):
+    """Равномерно распределяет процессы между владельцами"""
+    db = SessionLocal()
+    try:
+        summary = balance_assignments(db, by)
+        names = dict(db.query(models.Owner.id, models.Owner.full_name))
+        for item in summary:
+            print(f"{names[item['owner_id']]}: процессов {item['process_count']}, "
+                  f"суммарный рейтинг {item['total_rating']:.2f}")
         print("\nПроцессы успешно распределены между владельцами!")
 
     except Exception as e:
         print(f"Ошибка при назначении процессов: {e}")
-        db.rollback()
     finally:
         db.close()
 
 if __name__ == "__main__":
-    assign_processes()
+    import argparse
+    parser = argparse.ArgumentParser(description="Распределение процессов между владельцами")
+    parser.add_argument("--by", choices=BALANCE_MODES, default="count",
+                        help="балансировать по числу процессов или по сумме рейтингов "
+                             "(рейтинг процессов при импорте пока не заполняется, "
+                             "поэтому rating сейчас равносилен count)")
+    args = parser.parse_args()
+    assign_processes(by=args.by)
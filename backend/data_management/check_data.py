@@ -1,25 +1,38 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import SessionLocal
+from database import SessionLocal, engine
 import models
+from stats import read_stats
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from update_schema import add_missing_columns, backfill_import_stats
 
 def check_data():
+    # Статистика хранится в data_meta, которой может не быть в старой базе
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    backfill_import_stats()
     db = SessionLocal()
     try:
-        # Проверяем количество записей в каждой таблице
-        process_count = db.query(models.Process).count()
-        threat_count = db.query(models.Threat).count()
-        risk_detail_count = db.query(models.RiskDetail).count()
-        detailed_risk_count = db.query(models.DetailedRiskReport).count()
-        integral_rating_count = db.query(models.IntegralThreatRating).count()
+        # Количество записей берем из статистики, которую ведет импорт
+        stats = read_stats(db)
+        counts = stats["row_counts"]
+        process_count = counts["process_count"]
 
+        # В базе, импортированной до появления статистики, время импорта неизвестно
+        imported_at = stats["imported_at"] or ("неизвестно" if process_count else "не выполнялся")
+        print(f"\nПоследний импорт: {imported_at}")
         print("\nКоличество записей в таблицах:")
         print(f"Процессы: {process_count}")
-        print(f"Угрозы: {threat_count}")
-        print(f"Детали рисков: {risk_detail_count}")
-        print(f"Детальные отчеты: {detailed_risk_count}")
-        print(f"Интегральные рейтинги: {integral_rating_count}")
+        print(f"Угрозы: {counts['threat_count']}")
+        print(f"Детали рисков: {counts['risk_detail_count']}")
+        print(f"Детальные отчеты: {counts['detailed_risk_count']}")
+        print(f"Интегральные рейтинги: {counts['integral_rating_count']}")
+
+        if stats["table_sizes"]:
+            print("\nРазмер таблиц (с индексами):")
+            for table, size in sorted(stats["table_sizes"].items()):
+                print(f"{table}: {size / 1024:.0f} КБ")
 
         # Выводим пример процесса
         if process_count > 0:
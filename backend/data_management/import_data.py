@@ -10,6 +10,11 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import models
 from models import Process, Threat, RiskDetail, DetailedRiskReport, IntegralThreatRating
+from parse_cache import read_excel_cached
+from lookup import lookup_codec, register_lookup_values
+from generation import bump_generation
+from update_schema import migrate_lookup_columns, add_missing_columns
+from stats import record_import_stats
 
 def get_color_for_rating(rating: str) -> str:
     """Возвращает цвет для заданного рейтинга"""
@@ -47,24 +52,44 @@ def normalize_reserved_flag(value) -> str:
         return 'нет'
     return 'нет данных'
 
-def import_data():
+# Как часто сообщать о ходе импорта строк детального отчета
+PROGRESS_EVERY_ROWS = 2000
+
+def import_data(refresh_cache: bool = False, on_progress=None):
+    """Импортирует данные из Excel-отчетов.
+
+    Разобранные листы берутся из кэша разбора, если файлы не менялись;
+    refresh_cache=True заставляет разобрать файлы заново.
+    on_progress(stage, data) вызывается на каждом этапе импорта.
+    """
+    def report(stage: str, **data):
+        if on_progress is not None:
+            on_progress(stage, data)
+
     try:
+        report("parsing")
         # Определяем пути к файлам относительно корневой директории backend
         backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         integral_file = os.path.join(backend_dir, 'ОТЧЁТ_Интегральный_рейтинг_рисков_непрерывности_на_09_07_25.xlsx')
         detailed_file = os.path.join(backend_dir, 'ОТЧЁТ_Детальный_расчёт_рисков_непрерывности_на_09_07_25.xlsx')
 
-        # Читаем файлы Excel с явным указанием кодировки
-        df_integral = pd.read_excel(integral_file, engine='openpyxl')
-        df_detailed = pd.read_excel(detailed_file, engine='openpyxl')
+        # Читаем файлы Excel (или их разобранные копии из кэша)
+        df_integral = read_excel_cached(integral_file, refresh=refresh_cache)
+        df_detailed = read_excel_cached(detailed_file, refresh=refresh_cache)
 
         # Выводим колонки для проверки
         print("Колонки в файле интегрального рейтинга:", df_integral.columns.tolist())
         print("Колонки в файле детального отчета:", df_detailed.columns.tolist())
 
+        # Импорт может запускаться из CLI до первого старта сервера
+        models.Base.metadata.create_all(bind=engine)
+        migrate_lookup_columns()
+        add_missing_columns()
+
         db = SessionLocal()
 
         try:
+            report("clearing")
             # Очищаем существующие данные
             db.query(models.RiskDetail).delete()
             db.query(models.DetailedRiskReport).delete()
@@ -148,8 +173,16 @@ def import_data():
                 )
                 db.add(integral_rating)
             
+            report("integral", processes=len(processes), threats=len(threats))
+
+            # Строки детального отчета копим отдельно: перед записью их строковые
+            # значения нужно зарегистрировать в словаре lookup_values
+            pending_rows = []
+
             # Импортируем данные из детального отчета (df_detailed)
-            for _, row in df_detailed.iterrows():
+            for index, (_, row) in enumerate(df_detailed.iterrows()):
+                if index % PROGRESS_EVERY_ROWS == 0:
+                    report("detailed", rows=index, total=len(df_detailed))
                 process_sid = clean_value(row.get('Процесс sid'))
                 if not process_sid:
                     continue
@@ -192,9 +225,11 @@ def import_data():
                         tr=clean_value(row.get('TR')),
                         risk_assessment_explanation=clean_value(row.get('Автопояснение по результату оценки рисков')),
                         as_reserved_in_rcod=as_reserved_flag,
+                        system_name=clean_value(row.get('Наименование АС')),
+                        system_sid=clean_value(row.get('КЭ (АС sid)')),
                         threat_id=threat.id
                     )
-                    db.add(detailed_risk)
+                    pending_rows.append(detailed_risk)
                     
                     # Создаем запись RiskDetail с правильными полями
                     risk_detail = models.RiskDetail(
@@ -215,17 +250,31 @@ def import_data():
                         tr=clean_value(row.get('TR')),
                         threat_id=threat.id
                     )
-                    db.add(risk_detail)
-            
+                    pending_rows.append(risk_detail)
+
+            report("committing", rows=len(pending_rows))
+            register_lookup_values(db, pending_rows)
+            db.add_all(pending_rows)
+            record_import_stats(db)
+            bump_generation(db)
             db.commit()
             print("\nДанные успешно импортированы!")
+            report("done")
         except Exception as e:
             db.rollback()
+            # Словарь мог получить идентификаторы из отмененной транзакции
+            lookup_codec.reset()
             print(f"Ошибка при импорте данных: {e}")
+            report("failed", error=str(e))
         finally:
             db.close()
     except Exception as e:
         print(f"Ошибка при чтении файлов: {e}")
+        report("failed", error=str(e))
 
 if __name__ == "__main__":
-    import_data()
+    import argparse
+    parser = argparse.ArgumentParser(description="Импорт данных из Excel-отчетов")
+    parser.add_argument("--refresh-cache", action="store_true", help="разобрать файлы заново, игнорируя кэш разбора")
+    args = parser.parse_args()
+    import_data(refresh_cache=args.refresh_cache)
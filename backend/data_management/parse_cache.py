@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import BACKEND_DIR
+
+# Кэш разобранных листов Excel: по одному каталогу на хеш содержимого файла,
+# внутри — manifest.json и по одному .npy на колонку (числовые отображаются в память)
+CACHE_DIR = os.path.join(BACKEND_DIR, '.parse_cache')
+MAX_CACHE_ENTRIES = 8
+# Увеличивается при изменении формата кэша, чтобы старые записи не читались
+CACHE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+def file_hash(path: str) -> str:
+    """Возвращает SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cache_key(path: str) -> str:
+    return f"v{CACHE_FORMAT_VERSION}-{file_hash(path)}"
+
+def _write_entry(df: pd.DataFrame, entry_dir: str) -> None:
+    """Сохраняет DataFrame в каталог кэша: числовые колонки как есть,
+    строковые — словарным кодированием (коды int32 + список уникальных значений)"""
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df.iloc[:, i]
+        file_name = f"col_{i:03d}.npy"
+        if series.dtype == object:
+            codes, uniques = pd.factorize(series, use_na_sentinel=True)
+            uniques = uniques.tolist()
+            if not all(isinstance(v, (str, int, float, bool)) for v in uniques):
+                raise TypeError(f"Колонка '{name}' содержит значения, не поддерживаемые кэшем")
+            np.save(os.path.join(entry_dir, file_name), codes.astype(np.int32))
+            columns.append({'name': name, 'file': file_name, 'kind': 'dict', 'uniques': uniques})
+        else:
+            np.save(os.path.join(entry_dir, file_name), series.to_numpy())
+            columns.append({'name': name, 'file': file_name, 'kind': 'plain'})
+
+    with open(os.path.join(entry_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_FORMAT_VERSION, 'rows': len(df), 'columns': columns}, f, ensure_ascii=False)
+
+def _read_entry(entry_dir: str) -> pd.DataFrame:
+    """Загружает DataFrame из каталога кэша.
+
+    Числовые колонки остаются представлениями отображенных в память .npy
+    (copy=False не объединяет их в общий блок), строковые собираются из кодов.
+    """
+    with open(os.path.join(entry_dir, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    data = {}
+    for column in manifest['columns']:
+        values = np.load(os.path.join(entry_dir, column['file']), mmap_mode='r')
+        if column['kind'] == 'dict':
+            uniques = np.empty(len(column['uniques']) + 1, dtype=object)
+            uniques[:-1] = column['uniques']
+            uniques[-1] = np.nan
+            # Код -1 (пропуск) указывает на последний элемент — NaN
+            data[column['name']] = uniques[values]
+        else:
+            data[column['name']] = values
+    return pd.DataFrame(data, columns=[c['name'] for c in manifest['columns']], copy=False)
+
+def evict(max_entries: int = MAX_CACHE_ENTRIES) -> None:
+    """Удаляет самые давно использованные записи кэша сверх лимита"""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        manifest = os.path.join(CACHE_DIR, name, MANIFEST_NAME)
+        if os.path.exists(manifest):
+            entries.append((os.path.getmtime(manifest), name))
+        elif not name.startswith('.tmp'):
+            # Неполная запись (например, после сбоя) — удаляем
+            shutil.rmtree(os.path.join(CACHE_DIR, name), ignore_errors=True)
+    entries.sort(reverse=True)
+    for _, name in entries[max_entries:]:
+        shutil.rmtree(os.path.join(CACHE_DIR, name), ignore_errors=True)
+
+def clear_cache() -> None:
+    """Полностью очищает кэш разбора"""
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+def read_excel_cached(path: str, refresh: bool = False) -> pd.DataFrame:
+    """Читает Excel-файл, используя кэш по хешу содержимого.
+
+    При refresh=True файл разбирается заново, а запись в кэше перезаписывается.
+    """
+    key = _cache_key(path)
+    entry_dir = os.path.join(CACHE_DIR, key)
+    manifest = os.path.join(entry_dir, MANIFEST_NAME)
+
+    if not refresh and os.path.exists(manifest):
+        try:
+            df = _read_entry(entry_dir)
+            # Обновляем время использования для LRU-вытеснения
+            os.utime(manifest)
+            print(f"Файл {os.path.basename(path)} загружен из кэша разбора")
+            return df
+        except Exception as e:
+            print(f"Не удалось прочитать кэш для {os.path.basename(path)}: {e}")
+
+    df = pd.read_excel(path, engine='openpyxl')
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp', dir=CACHE_DIR)
+        try:
+            _write_entry(df, tmp_dir)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        evict()
+    except Exception as e:
+        # Кэш — только оптимизация, ошибки записи не должны ломать импорт
+        print(f"Не удалось сохранить кэш для {os.path.basename(path)}: {e}")
+
+    return df
+
+if __name__ == "__main__":
+    clear_cache()
+    print(f"Кэш разбора {CACHE_DIR} очищен")
@@ -17,5 +17,102 @@ def add_column_if_not_exists():
         else:
             print("Column 'as_reserved_in_rcod' already exists.")
 
+def migrate_lookup_columns():
+    """Переводит строковые колонки detailed_risk_reports и risk_details на словарное кодирование.
+
+    Таблица пересоздается по текущей модели, а строки переносятся
+    с заменой значений на идентификаторы из lookup_values. После пересоздания
+    база сжимается командой VACUUM, иначе освободившиеся страницы остаются в файле.
+    """
+    import models
+    from lookup import LookupString, lookup_codec
+
+    models.LookupValue.__table__.create(bind=engine, checkfirst=True)
+    migrated = False
+    for table in (models.DetailedRiskReport.__table__, models.RiskDetail.__table__):
+        with engine.begin() as connection:
+            declared = {row[1]: row[2].upper() for row in connection.execute(text(f"PRAGMA table_info({table.name});"))}
+            lookup_columns = [c.name for c in table.columns if isinstance(c.type, LookupString)]
+            # Отсутствующие колонки не требуют пересоздания: их добавит add_missing_columns
+            if not declared or all(declared.get(c, 'INTEGER') == 'INTEGER' for c in lookup_columns):
+                continue
+
+            print(f"Migrating {table.name} to lookup_values...")
+            old_name = f"{table.name}_old"
+            connection.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name};"))
+            # Индексы переезжают вместе с переименованной таблицей, их имена нужно освободить
+            indexes = connection.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL;"
+            ), {"table": old_name}).all()
+            for (index,) in indexes:
+                connection.execute(text(f'DROP INDEX "{index}";'))
+            table.create(bind=connection)
+
+            select_columns = []
+            for column in table.columns:
+                if column.name not in declared:
+                    select_columns.append("NULL")
+                elif column.name in lookup_columns:
+                    connection.execute(text(
+                        f"INSERT OR IGNORE INTO lookup_values (value) "
+                        f"SELECT DISTINCT {column.name} FROM {old_name} WHERE {column.name} IS NOT NULL;"
+                    ))
+                    select_columns.append(
+                        f"(SELECT id FROM lookup_values WHERE value = {old_name}.{column.name})"
+                    )
+                else:
+                    select_columns.append(column.name)
+            column_names = ", ".join(c.name for c in table.columns)
+            connection.execute(text(
+                f"INSERT INTO {table.name} ({column_names}) SELECT {', '.join(select_columns)} FROM {old_name};"
+            ))
+            connection.execute(text(f"DROP TABLE {old_name};"))
+            migrated = True
+            print("Migration completed.")
+    lookup_codec.reset()
+
+    if migrated:
+        # VACUUM не выполняется внутри транзакции, поэтому нужно отдельное соединение
+        print("Vacuuming database...")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("VACUUM;"))
+
+def add_missing_columns():
+    """Добавляет колонки, появившиеся в моделях data_meta и detailed_risk_reports после создания таблиц"""
+    import models
+
+    for table in (models.DataMeta.__table__, models.DetailedRiskReport.__table__):
+        with engine.begin() as connection:
+            existing = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table.name});"))}
+            if not existing:
+                continue
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    print(f"Adding column '{column.name}' to {table.name} table...")
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type};"))
+
+def backfill_import_stats():
+    """Однократно заполняет статистику data_meta для базы, импортированной до появления счетчиков"""
+    import models
+    from database import SessionLocal
+    from stats import record_import_stats
+
+    # update_schema.py может запускаться на старой базе, где таблицы data_meta еще нет
+    models.DataMeta.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        meta = db.get(models.DataMeta, 1)
+        if meta is not None and meta.process_count is not None:
+            return
+        print("Backfilling data_meta statistics...")
+        record_import_stats(db, backfill=True)
+        db.commit()
+    finally:
+        db.close()
+
 if __name__ == "__main__":
-    add_column_if_not_exists() 
\ No newline at end of file
+    add_column_if_not_exists()
+    migrate_lookup_columns()
+    add_missing_columns()
+    backfill_import_stats() 
\ No newline at end of file
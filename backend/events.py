@@ -0,0 +1,113 @@
+import asyncio
+import json
+import collections
+from starlette.concurrency import run_in_threadpool
+from generation import current_generation
+
+# Как часто общий наблюдатель проверяет поколение данных (импорт мог пройти в другом процессе)
+GENERATION_POLL_SECONDS = 2
+# Интервал комментариев-пингов, чтобы прокси не закрывали простаивающие соединения
+KEEPALIVE_SECONDS = 15
+HISTORY_SIZE = 100
+
+class Broadcaster:
+    """Общая для всех клиентов лента событий.
+
+    События хранятся в кольцевом буфере с номерами; подписчики только ждут
+    общий asyncio.Event и дочитывают буфер, поэтому каждое подключение
+    не требует ни своей очереди, ни своих запросов к базе данных.
+    """
+
+    def __init__(self, history_size: int = HISTORY_SIZE):
+        self._history = collections.deque(maxlen=history_size)
+        self._seq = 0
+        self._loop = None
+        self._changed = None
+        self._latest = {}
+        self._watcher = None
+
+    def start(self) -> None:
+        """Привязывает ленту к циклу событий сервера и запускает наблюдение за поколением"""
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self._watcher = self._loop.create_task(self._watch_generation())
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    def _publish(self, event: str, data: dict) -> None:
+        self._seq += 1
+        self._history.append((self._seq, event, data))
+        self._latest[event] = (self._seq, event, data)
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, event: str, data: dict) -> None:
+        """Публикует событие; можно вызывать из любого потока"""
+        if self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._publish(event, data)
+        else:
+            self._loop.call_soon_threadsafe(self._publish, event, data)
+
+    async def _watch_generation(self) -> None:
+        generation = None
+        while True:
+            try:
+                current = await run_in_threadpool(current_generation)
+            except Exception as e:
+                # Например, база заблокирована импортом; повторим на следующем опросе
+                print(f"Ошибка при чтении поколения данных: {e}")
+            else:
+                if current != generation:
+                    generation = current
+                    self._publish("generation", {"generation": generation})
+            await asyncio.sleep(GENERATION_POLL_SECONDS)
+
+    async def subscribe(self, last_event_id: int | None = None):
+        """Асинхронно выдает события (номер, тип, данные), начиная после last_event_id.
+
+        Новый подписчик сразу получает последнее известное поколение данных.
+        Пока событий нет, выдается None — сигнал отправить пинг.
+        """
+        oldest = self._history[0][0] if self._history else self._seq + 1
+        if last_event_id is not None and not (oldest - 1 <= last_event_id <= self._seq):
+            # Пропущенные события уже вытеснены из буфера или сервер перезапускался
+            last_event_id = None
+        if last_event_id is None:
+            pending = [self._latest["generation"]] if "generation" in self._latest else []
+            seen = self._seq
+        else:
+            pending = [item for item in self._history if item[0] > last_event_id]
+            seen = max(last_event_id, pending[-1][0]) if pending else last_event_id
+        for item in pending:
+            yield item
+
+        while True:
+            changed = self._changed
+            if self._seq == seen:
+                try:
+                    await asyncio.wait_for(changed.wait(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+            for item in list(self._history):
+                if item[0] > seen:
+                    seen = item[0]
+                    yield item
+
+def format_sse(item) -> str:
+    """Кодирует событие в формат text/event-stream"""
+    if item is None:
+        return ": keep-alive\n\n"
+    seq, event, data = item
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+broadcaster = Broadcaster()
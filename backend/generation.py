@@ -0,0 +1,32 @@
+import os
+from sqlalchemy import text
+from database import engine, DB_PATH
+import models
+
+# Последнее прочитанное поколение и время изменения файла БД, при котором оно было прочитано
+_cached = (None, 0)
+
+def bump_generation(session) -> None:
+    """Увеличивает поколение данных в рамках транзакции session"""
+    updated = session.execute(text("UPDATE data_meta SET generation = generation + 1 WHERE id = 1"))
+    if updated.rowcount == 0:
+        session.add(models.DataMeta(id=1, generation=1))
+
+def current_generation() -> int:
+    """Возвращает текущее поколение данных.
+
+    Пока файл БД не менялся, значение берется из памяти без запроса к базе;
+    так изменения, сделанные другим процессом (например, импортом из CLI), тоже замечаются.
+    """
+    global _cached
+    try:
+        mtime = os.stat(DB_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+    cached_mtime, generation = _cached
+    if cached_mtime == mtime:
+        return generation
+    with engine.connect() as connection:
+        generation = connection.execute(text("SELECT generation FROM data_meta WHERE id = 1")).scalar() or 0
+    _cached = (mtime, generation)
+    return generation
@@ -0,0 +1,90 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from generation import current_generation
+
+DEFAULT_COLOR = '#6c757d'  # серый цвет по умолчанию, как в /threats
+
+# Для каждой угрозы процесса берется последний рейтинг с тем же типом и сценарием.
+# Тип и сценарий в threats и integral_threat_ratings пишутся импортом из одной
+# ячейки отчета, поэтому достаточно точного сравнения строк.
+GRAPH_QUERY = text("""
+    SELECT p.sid, p.name, t.type, t.scenario, r.threat_rating, r.color
+    FROM processes p
+    LEFT JOIN threats t ON t.process_sid = p.sid
+    LEFT JOIN (
+        SELECT process_sid, threat_type, threat_scenario, threat_rating, color, MAX(id)
+        FROM integral_threat_ratings
+        GROUP BY process_sid, threat_type, threat_scenario
+    ) r ON r.process_sid = t.process_sid
+        AND r.threat_type = t.type
+        AND r.threat_scenario = t.scenario
+    WHERE p.owner_id = :owner_id
+    ORDER BY p.id, t.id
+""")
+
+# Графы владельцев для текущего поколения данных
+_cache = {"generation": None, "graphs": {}}
+
+def build_process_graph(db: Session, owner_id: int) -> dict:
+    """Строит граф процесс -> угроза для процессов владельца одним запросом.
+
+    Узлы и ребра возвращаются колонками; все строки вынесены в общую
+    таблицу strings, а в колонках хранятся индексы в ней.
+    """
+    strings = []
+    string_ids = {}
+
+    def intern(value) -> int:
+        value = value or ''
+        index = string_ids.get(value)
+        if index is None:
+            index = string_ids[value] = len(strings)
+            strings.append(value)
+        return index
+
+    processes = {"sid": [], "name": []}
+    threats = {"type": [], "scenario": []}
+    edges = {"process": [], "threat": [], "rating": [], "color": []}
+    process_ids = {}
+    threat_ids = {}
+
+    for sid, name, threat_type, scenario, rating, color in db.execute(GRAPH_QUERY, {"owner_id": owner_id}):
+        process_id = process_ids.get(sid)
+        if process_id is None:
+            process_id = process_ids[sid] = len(process_ids)
+            processes["sid"].append(intern(sid))
+            processes["name"].append(intern(name))
+        if threat_type is None and scenario is None:
+            continue
+
+        threat_key = (threat_type, scenario)
+        threat_id = threat_ids.get(threat_key)
+        if threat_id is None:
+            threat_id = threat_ids[threat_key] = len(threat_ids)
+            threats["type"].append(intern(threat_type))
+            threats["scenario"].append(intern(scenario))
+
+        edges["process"].append(process_id)
+        edges["threat"].append(threat_id)
+        edges["rating"].append(intern(rating))
+        edges["color"].append(intern(color or DEFAULT_COLOR))
+
+    return {
+        "strings": strings,
+        "processes": processes,
+        "threats": threats,
+        "edges": edges,
+    }
+
+def get_process_graph(db: Session, owner_id: int) -> dict:
+    """Возвращает граф владельца, кэшированный до смены поколения данных"""
+    global _cache
+    generation = current_generation()
+    cache = _cache
+    if cache["generation"] != generation:
+        cache = _cache = {"generation": generation, "graphs": {}}
+    graph = cache["graphs"].get(owner_id)
+    if graph is None:
+        graph = {"generation": generation, **build_process_graph(db, owner_id)}
+        cache["graphs"][owner_id] = graph
+    return graph
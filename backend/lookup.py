@@ -0,0 +1,147 @@
+import threading
+from sqlalchemy import Integer, text
+from sqlalchemy.types import TypeDecorator
+from database import engine
+
+LOOKUP_TABLE = "lookup_values"
+
+class LookupCodec:
+    """Словарь строк <-> целочисленных идентификаторов из таблицы lookup_values.
+
+    Таблица только пополняется: идентификаторы никогда не переиспользуются,
+    поэтому закэшированные в памяти значения всегда остаются верными,
+    а при промахе достаточно перечитать таблицу.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        # Поколение данных, при котором словарь был прочитан; None — словарь не загружен
+        self._generation = None
+
+    def _swap(self, rows) -> None:
+        ids = {value: id_ for id_, value in rows}
+        self._values = {id_: value for value, id_ in ids.items()}
+        self._ids = ids
+
+    def reload(self) -> None:
+        """Перечитывает словарь из базы данных"""
+        # generation импортирует models, а те — этот модуль
+        from generation import current_generation
+
+        with self._lock:
+            # Поколение читается до загрузки: словарь не старше него
+            generation = current_generation()
+            with engine.connect() as connection:
+                self._swap(connection.execute(text(f"SELECT id, value FROM {LOOKUP_TABLE}")).all())
+            self._generation = generation
+
+    def _reload_if_stale(self) -> bool:
+        """Перечитывает словарь, только если он не загружен или данные с тех пор менялись.
+
+        Новые строки появляются в таблице лишь при импорте вместе со сменой поколения,
+        поэтому промах по неизвестному значению не требует обращения к базе.
+        """
+        from generation import current_generation
+
+        if self._generation is not None and self._generation == current_generation():
+            return False
+        self.reload()
+        return True
+
+    def reset(self) -> None:
+        """Сбрасывает кэш; он будет загружен заново при следующем обращении"""
+        with self._lock:
+            self._ids = {}
+            self._values = {}
+            self._generation = None
+
+    def encode(self, value, strict: bool = False):
+        """Возвращает идентификатор строки.
+
+        Для неизвестной строки возвращает -1 (ничему не соответствует в фильтрах),
+        а при strict=True выбрасывает LookupError.
+        """
+        if value is None:
+            return None
+        id_ = self._ids.get(value)
+        if id_ is None and self._reload_if_stale():
+            id_ = self._ids.get(value)
+        if id_ is None:
+            if strict:
+                raise LookupError(
+                    f"Значение '{value}' отсутствует в {LOOKUP_TABLE}: "
+                    f"перед записью его нужно зарегистрировать через register_lookup_values"
+                )
+            return -1
+        return id_
+
+    def decode(self, id_):
+        """Возвращает строку по идентификатору"""
+        value = self._values.get(id_)
+        if value is None and id_ is not None:
+            self.reload()
+            value = self._values.get(id_)
+            if value is None:
+                raise LookupError(f"Идентификатор {id_} отсутствует в {LOOKUP_TABLE}")
+        return value
+
+    def register(self, session, values) -> None:
+        """Добавляет недостающие строки в словарь в рамках транзакции session.
+
+        Должна вызываться до flush объектов, ссылающихся на эти строки.
+        """
+        values = {v for v in values if v is not None}
+        with self._lock:
+            query = text(f"SELECT id, value FROM {LOOKUP_TABLE}")
+            known = {value for _, value in session.execute(query)}
+            missing = [{"value": v} for v in values - known]
+            if missing:
+                session.execute(text(f"INSERT INTO {LOOKUP_TABLE} (value) VALUES (:value)"), missing)
+            self._swap(session.execute(query).all())
+
+lookup_codec = LookupCodec()
+
+class LookupString(TypeDecorator):
+    """Строковая колонка, хранимая как ссылка на lookup_values.
+
+    Атрибуты модели и параметры фильтров остаются строками,
+    а в базе данных хранятся и сравниваются целые числа.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        # Записываемое значение должно быть зарегистрировано, иначе строка не прочитается
+        return lookup_codec.encode(value, strict=True)
+
+    def coerce_compared_value(self, op, value):
+        # Параметры сравнений (==, in_ и т.п.) кодируются без проверки
+        return LookupStringFilter()
+
+    def process_result_value(self, value, dialect):
+        return lookup_codec.decode(value)
+
+    def result_processor(self, dialect, coltype):
+        # Декодирование выполняется для каждой ячейки результата, поэтому
+        # отдаем метод кодека напрямую, без обертки TypeDecorator
+        return lookup_codec.decode
+
+class LookupStringFilter(LookupString):
+    """Тип параметров фильтров по LookupString-колонкам: неизвестная строка ничему не соответствует"""
+
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return lookup_codec.encode(value)
+
+def register_lookup_values(session, objects) -> None:
+    """Регистрирует в словаре все значения LookupString-колонок переданных объектов"""
+    values = set()
+    for obj in objects:
+        for column in obj.__table__.columns:
+            if isinstance(column.type, LookupString):
+                values.add(getattr(obj, column.key))
+    lookup_codec.register(session, values)
@@ -1,17 +1,29 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from typing import List
 import models
 from database import get_db, engine
+from graph import get_process_graph
+from stats import read_stats
+from rating_engine import get_rating_engine, RESERVED_YES, RESERVED_NO
+from events import broadcaster, format_sse
+from read_model import get_read_model, refresh_read_model, READ_MODEL_ENABLED
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from data_management.import_data import import_data
-from data_management.update_schema import add_column_if_not_exists
+from data_management.assign_processes import balance_assignments, BALANCE_MODES
+from data_management.update_schema import add_column_if_not_exists, migrate_lookup_columns, add_missing_columns, backfill_import_stats
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from generation import current_generation
 from sqlalchemy import and_
+import os
 import hashlib
 from datetime import datetime, timedelta
 import jwt
 from typing import Optional
+from pydantic import BaseModel
 
 app = FastAPI()
 
@@ -25,19 +37,99 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Сжимаем ответы крупнее порога (детальные отчеты, списки процессов)
+GZIP_MINIMUM_SIZE = 1024
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
 # Создаем таблицы при запуске
 models.Base.metadata.create_all(bind=engine)
 
 # Обновляем схему базы данных если нужно
 add_column_if_not_exists()
+migrate_lookup_columns()
+add_missing_columns()
+backfill_import_stats()
+
+@app.on_event("startup")
+async def start_broadcaster():
+    broadcaster.start()
+    if READ_MODEL_ENABLED:
+        refresh_read_model()
+
+@app.on_event("shutdown")
+async def stop_broadcaster():
+    await broadcaster.stop()
 
 # Настройки JWT
 SECRET_KEY = "your-secret-key"  # В продакшене использовать безопасный ключ
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Администраторы перечисляются через запятую в переменной окружения RISKS_ADMIN_USERS;
+# без нее административные эндпоинты недоступны никому
+ADMIN_USERNAMES = frozenset(
+    name.strip() for name in os.environ.get("RISKS_ADMIN_USERS", "").split(",") if name.strip()
+)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Эндпоинты, чьи ответы зависят только от поколения данных, пользователя и параметров запроса
+ETAG_PATH_PREFIXES = (
+    "/processes",
+    "/process/",
+    "/threats/",
+    "/risk-details/",
+    "/detailed-risk-report/",
+    "/integral-threat-ratings/",
+    "/graph",
+    "/users/me/processes",
+)
+
+def username_from_request(request: Request) -> Optional[str]:
+    """Возвращает пользователя из Bearer-токена без обращения к базе данных"""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except jwt.PyJWTError:
+        return None
+
+def compute_etag(request: Request, username: str, generation: int) -> str:
+    """Строгий ETag по поколению данных, пользователю, запросу и кодированию ответа"""
+    gzip_accepted = "gzip" in request.headers.get("Accept-Encoding", "")
+    key = f"{generation}|{username}|{request.url.path}?{request.url.query}|{gzip_accepted}"
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    """Отвечает 304 на If-None-Match с актуальным ETag, не выполняя эндпоинт"""
+    if request.method != "GET" or not request.url.path.startswith(ETAG_PATH_PREFIXES):
+        return await call_next(request)
+    username = username_from_request(request)
+    if username is None:
+        # Без валидного токена эндпоинт сам вернет 401
+        return await call_next(request)
+
+    try:
+        # Чтение поколения может ждать блокировку SQLite, поэтому выполняется вне цикла событий
+        generation = await run_in_threadpool(current_generation)
+    except Exception as e:
+        # Без поколения ETag не вычислить — отвечаем обычным образом
+        print(f"Ошибка при чтении поколения данных: {e}")
+        return await call_next(request)
+
+    etag = compute_etag(request, username, generation)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization, Accept-Encoding"}
+    if_none_match = request.headers.get("If-None-Match", "")
+    if etag in (tag.strip() for tag in if_none_match.split(",")):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code == status.HTTP_200_OK:
+        response.headers.update(headers)
+    return response
+
 def hash_password(password: str) -> str:
     """Хеширует пароль с использованием SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
@@ -77,6 +169,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         raise credentials_exception
     return user
 
+async def get_admin_user(current_user: models.Owner = Depends(get_current_user)):
+    """Пропускает только пользователей из списка администраторов"""
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
+
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Эндпоинт для получения токена доступа"""
@@ -115,14 +216,77 @@ async def read_user_processes(
 def read_root():
     return {"Hello": "World"}
 
+@app.get("/stats")
+def get_stats(db: Session = Depends(get_db)):
+    """Статистика набора данных: число строк, размеры таблиц и время последнего импорта"""
+    return read_stats(db)
+
+@app.get("/events")
+async def events(request: Request):
+    """Поток server-sent events: смена поколения данных (generation) и ход импорта (import)"""
+    last_event_id = request.headers.get("Last-Event-ID")
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+
+    async def stream():
+        async for item in broadcaster.subscribe(last_event_id):
+            yield format_sse(item)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # identity отключает GZipMiddleware: сжатие буферизует события
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/import-data")
-def import_data_endpoint():
+def import_data_endpoint(refresh_cache: bool = False):
     try:
-        import_data()
+        import_data(
+            refresh_cache=refresh_cache,
+            on_progress=lambda stage, data: broadcaster.publish("import", {"stage": stage, **data}),
+        )
         return {"status": "success", "message": "Data imported successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/admin/assign-processes")
+def assign_processes_endpoint(
+    by: str = "count",
+    current_user: models.Owner = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Равномерно перераспределяет процессы между владельцами (by: count или rating)"""
+    if by not in BALANCE_MODES:
+        raise HTTPException(status_code=400, detail=f"Parameter 'by' must be one of: {', '.join(BALANCE_MODES)}")
+    try:
+        summary = balance_assignments(db, by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", "owners": summary}
+
+class ReservationOverride(BaseModel):
+    """Переопределение резервирования АС в РЦОД для строк, подходящих под все заданные условия"""
+    as_reserved_in_rcod: str
+    process_sid: Optional[str] = None
+    system_sid: Optional[str] = None
+    system_name: Optional[str] = None
+
+class WhatIfRequest(BaseModel):
+    overrides: List[ReservationOverride]
+
+@app.post("/admin/what-if")
+def what_if_endpoint(
+    request: WhatIfRequest,
+    current_user: models.Owner = Depends(get_admin_user)
+):
+    """Пересчитывает рейтинги угроз и процессов с переопределенным резервированием АС"""
+    for override in request.overrides:
+        if override.as_reserved_in_rcod not in (RESERVED_YES, RESERVED_NO):
+            raise HTTPException(status_code=400, detail=f"as_reserved_in_rcod must be '{RESERVED_YES}' or '{RESERVED_NO}'")
+        if override.process_sid is None and override.system_sid is None and override.system_name is None:
+            raise HTTPException(status_code=400, detail="Override must set process_sid, system_sid or system_name")
+    return get_rating_engine().what_if([override.model_dump() for override in request.overrides])
+
 @app.get("/processes")
 def get_processes(
     current_user: models.Owner = Depends(get_current_user),
@@ -131,6 +295,14 @@ def get_processes(
     processes = db.query(models.Process).filter(models.Process.owner_id == current_user.id).all()
     return processes
 
+@app.get("/graph")
+def get_graph(
+    current_user: models.Owner = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Граф процесс -> угроза по всем процессам текущего пользователя"""
+    return get_process_graph(db, current_user.id)
+
 @app.get("/process/{process_sid}")
 def get_process(
     process_sid: str, 
@@ -150,6 +322,12 @@ def get_threats(
     current_user: models.Owner = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    snapshot = get_read_model()
+    if snapshot is not None:
+        if not snapshot.owns(current_user.id, process_sid):
+            raise HTTPException(status_code=404, detail="Process not found")
+        return snapshot.get_threats(process_sid)
+
     # Проверяем принадлежность процесса пользователю
     process = db.query(models.Process).filter(
         and_(models.Process.sid == process_sid, models.Process.owner_id == current_user.id)
@@ -219,6 +397,15 @@ def get_risk_details(
     current_user: models.Owner = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    snapshot = get_read_model()
+    if snapshot is not None:
+        if not snapshot.owns(current_user.id, process_sid):
+            raise HTTPException(status_code=404, detail="Process not found")
+        risk_details = snapshot.get_risk_detail(process_sid, threat_type, threat_scenario)
+        if risk_details is None:
+            raise HTTPException(status_code=404, detail="Risk details not found")
+        return risk_details
+
     # Проверяем принадлежность процесса пользователю
     process = db.query(models.Process).filter(
         and_(models.Process.sid == process_sid, models.Process.owner_id == current_user.id)
@@ -245,6 +432,15 @@ def get_detailed_risk_report(
     current_user: models.Owner = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    snapshot = get_read_model()
+    if snapshot is not None:
+        if not snapshot.owns(current_user.id, process_sid):
+            raise HTTPException(status_code=404, detail="Process not found")
+        reports = snapshot.get_detailed_risk_report(process_sid, threat_type, threat_scenario)
+        if not reports:
+            raise HTTPException(status_code=404, detail="Reports not found")
+        return reports
+
     # Проверяем принадлежность процесса пользователю
     process = db.query(models.Process).filter(
         and_(models.Process.sid == process_sid, models.Process.owner_id == current_user.id)
@@ -269,6 +465,12 @@ def get_integral_threat_ratings(
     current_user: models.Owner = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    snapshot = get_read_model()
+    if snapshot is not None:
+        if not snapshot.owns(current_user.id, process_sid):
+            raise HTTPException(status_code=404, detail="Process not found")
+        return snapshot.get_integral_threat_ratings(process_sid)
+
     # Проверяем принадлежность процесса пользователю
     process = db.query(models.Process).filter(
         and_(models.Process.sid == process_sid, models.Process.owner_id == current_user.id)
@@ -1,6 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from database import Base
+from lookup import LookupString
+
+class LookupValue(Base):
+    __tablename__ = "lookup_values"
+
+    id = Column(Integer, primary_key=True)
+    value = Column(String, unique=True, nullable=False)  # Повторяющееся строковое значение
 
 class Owner(Base):
     __tablename__ = "owners"
@@ -53,17 +60,17 @@ class RiskDetail(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     process_sid = Column(String, index=True)  # Process SID для связи
-    threat_type = Column(String)  # Тип угрозы
-    threat_scenario = Column(String)  # Сценарий угрозы
-    impact_type = Column(String)  # Тип влияния
+    threat_type = Column(LookupString, ForeignKey("lookup_values.id"))  # Тип угрозы
+    threat_scenario = Column(LookupString, ForeignKey("lookup_values.id"))  # Сценарий угрозы
+    impact_type = Column(LookupString, ForeignKey("lookup_values.id"))  # Тип влияния
     
     # Воздействие риска
     risk_impact = Column(String)  # Воздействие риска
     
     # Результаты оценки риска
     risk_assessment = Column(String)  # Результаты оценки риска
-    risk_label = Column(String)  # Метки риска
-    risk_assessment_explanation = Column(String)  # Автопояснение результатов оценки риска
+    risk_label = Column(LookupString, ForeignKey("lookup_values.id"))  # Метки риска
+    risk_assessment_explanation = Column(LookupString, ForeignKey("lookup_values.id"))  # Автопояснение результатов оценки риска
     
     # Базовая информация из интегрального отчета
     high_risk_count = Column(String)  # Количество высоких рисков (числитель метки)
@@ -71,7 +78,7 @@ class RiskDetail(Base):
     process_threat_rating = Column(String)  # Рейтинг процесса для угрозы = по максимальным рискам =
     
     # Новые поля
-    as_reserved_in_rcod = Column(String)  # АС зарезервирована в РЦОД (комментарий)
+    as_reserved_in_rcod = Column(LookupString, ForeignKey("lookup_values.id"))  # АС зарезервирована в РЦОД (комментарий)
     rto_hours = Column(String)  # RTO процесса, ч.
     mtpd = Column(String)  # MTPD процесса
     tr = Column(String)  # TR
@@ -83,15 +90,15 @@ class DetailedRiskReport(Base):
     __tablename__ = "detailed_risk_reports"
 
     id = Column(Integer, primary_key=True, index=True)
-    process = Column(String)  # Процесс
+    process = Column(LookupString, ForeignKey("lookup_values.id"))  # Процесс
     process_sid = Column(String, index=True)  # Process SID для связи
-    threat_type = Column(String)  # Тип угрозы
-    threat_scenario = Column(String)  # Сценарий угрозы
+    threat_type = Column(LookupString, ForeignKey("lookup_values.id"))  # Тип угрозы
+    threat_scenario = Column(LookupString, ForeignKey("lookup_values.id"))  # Сценарий угрозы
     
     # Основные показатели
-    impact_type = Column(String)  # Тип влияния (переименовано с risk_category)
+    impact_type = Column(LookupString, ForeignKey("lookup_values.id"))  # Тип влияния (переименовано с risk_category)
     risk_subcategory = Column(String)  # Подкатегория риска
-    risk_group = Column(String)  # Группа риска
+    risk_group = Column(LookupString, ForeignKey("lookup_values.id"))  # Группа риска
     risk_subgroup = Column(String)  # Подгруппа риска
     
     # Оценки рисков
@@ -105,15 +112,32 @@ class DetailedRiskReport(Base):
     impact_assessment = Column(String)  # Оценка воздействия
     probability_assessment = Column(String)  # Оценка вероятности
     control_assessment = Column(String)  # Оценка контроля
-    risk_level = Column(String)  # Уровень риска
+    risk_level = Column(LookupString, ForeignKey("lookup_values.id"))  # Уровень риска
     
     # Новые поля
     rto_hours = Column(String)  # RTO процесса, ч.
     mtpd = Column(String)  # MTPD процесса
     tr = Column(String)  # TR
-    risk_assessment_explanation = Column(String)  # Автопояснение по результату оценки рисков
-    as_reserved_in_rcod = Column(String)  # АС зарезервирована в РЦОД (да/нет)
+    risk_assessment_explanation = Column(LookupString, ForeignKey("lookup_values.id"))  # Автопояснение по результату оценки рисков
+    as_reserved_in_rcod = Column(LookupString, ForeignKey("lookup_values.id"))  # АС зарезервирована в РЦОД (да/нет)
+    system_name = Column(LookupString, ForeignKey("lookup_values.id"))  # Наименование АС
+    system_sid = Column(LookupString, ForeignKey("lookup_values.id"))  # КЭ (АС sid)
     
     # Связь с угрозой
     threat_id = Column(Integer, ForeignKey("threats.id"))
     threat = relationship("Threat", back_populates="detailed_risks")
+
+class DataMeta(Base):
+    __tablename__ = "data_meta"
+
+    id = Column(Integer, primary_key=True)  # Единственная строка с id = 1
+    generation = Column(Integer, nullable=False, default=0)  # Поколение данных, растет при каждом изменении
+
+    # Статистика набора данных, обновляется импортом в той же транзакции
+    imported_at = Column(DateTime)  # Время последнего импорта (UTC)
+    process_count = Column(Integer, default=0)  # Процессы
+    threat_count = Column(Integer, default=0)  # Угрозы
+    risk_detail_count = Column(Integer, default=0)  # Детали рисков
+    detailed_risk_count = Column(Integer, default=0)  # Детальные отчеты
+    integral_rating_count = Column(Integer, default=0)  # Интегральные рейтинги
+    table_sizes = Column(String)  # JSON: размер каждой таблицы вместе с индексами, байт
@@ -0,0 +1,192 @@
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from database import engine
+from generation import current_generation
+from lookup import lookup_codec
+from data_management.import_data import get_color_for_rating
+
+# Уровни риска по возрастанию; 0 — уровень не указан
+LEVELS = ['', 'Низкий', 'Средний', 'Высокий', 'Критический']
+LEVEL_CODES = {name: code for code, name in enumerate(LEVELS)}
+
+RESERVED_YES = 'да'
+RESERVED_NO = 'нет'
+SYSTEM_IMPACT_TYPE = 'АС'
+
+ROWS_QUERY = text("""
+    SELECT process_sid, threat_type, threat_scenario, impact_type,
+           integral_risk, as_reserved_in_rcod, system_sid, system_name
+    FROM detailed_risk_reports
+""")
+
+# Уровни угроз, сохраненные при импорте из интегрального отчета (их показывает /threats)
+STORED_LEVELS_QUERY = text("""
+    SELECT process_sid, type, scenario, integral_risk_level
+    FROM threats
+""")
+
+def group_starts(values):
+    """Индексы начала групп одинаковых подряд идущих значений (пустой массив для пустого входа)"""
+    if len(values) == 0:
+        return np.array([], dtype=np.intp)
+    return np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+
+def aggregate_levels(levels, starts, counts):
+    """Сворачивает уровни рисков строк в рейтинги угроз.
+
+    Строки должны быть упорядочены по угрозам; starts и counts задают границы групп.
+    Возвращает (максимальный уровень, число рисков максимального уровня,
+    интегральный уровень). Интегральный уровень равен максимальному, если
+    на нем больше половины рисков угрозы, иначе он на ступень ниже.
+    """
+    highest = np.maximum.reduceat(levels, starts)
+    at_highest = levels == np.repeat(highest, counts)
+    high_count = np.add.reduceat(at_highest, starts)
+    integral = np.where(high_count * 2 > counts, highest, np.maximum(highest - 1, 1))
+    integral = np.where(highest > 0, integral, 0)
+    return highest, high_count, integral
+
+class RatingEngine:
+    """Пересчет интегральных рейтингов угроз и процессов по строкам детального отчета.
+
+    Строки загружаются один раз и хранятся массивами, упорядоченными по
+    (процесс, тип угрозы, сценарий), поэтому пересчет сводится к нескольким
+    векторным операциям reduceat без обращения к базе данных.
+    """
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        with engine.connect() as connection:
+            # Строки выбираются без ORM: словарные колонки остаются целыми кодами
+            df = pd.read_sql_query(ROWS_QUERY, connection)
+            stored_levels = {
+                (process_sid, threat_type, threat_scenario): level
+                for process_sid, threat_type, threat_scenario, level in connection.execute(STORED_LEVELS_QUERY)
+            }
+
+        df = df.sort_values(['process_sid', 'threat_type', 'threat_scenario'], kind='stable')
+        df = df.reset_index(drop=True)
+        keys = df[['process_sid', 'threat_type', 'threat_scenario']]
+        group = keys.ne(keys.shift()).any(axis=1).cumsum().to_numpy() - 1
+        # Для пустой таблицы групп нет: все массивы ниже пустые, и пересчет ничего не меняет
+        self.starts = group_starts(group)
+        self.counts = np.diff(np.r_[self.starts, len(df)])
+
+        threats = keys.iloc[self.starts].reset_index(drop=True)
+        self.threat_process_sid = threats['process_sid'].to_numpy()
+        self.threat_type = [lookup_codec.decode(v) for v in threats['threat_type']]
+        self.threat_scenario = [lookup_codec.decode(v) for v in threats['threat_scenario']]
+        self.stored_integral = [
+            stored_levels.get(key) for key in zip(self.threat_process_sid, self.threat_type, self.threat_scenario)
+        ]
+        # Угрозы одного процесса идут подряд, как и строки одной угрозы
+        self.process_starts = group_starts(self.threat_process_sid)
+        self.process_sids = self.threat_process_sid[self.process_starts]
+
+        self.levels = df['integral_risk'].map(LEVEL_CODES).fillna(0).to_numpy(dtype=np.int8)
+        reserved = df['as_reserved_in_rcod'].to_numpy()
+        # 1 — зарезервирована, 0 — нет, -1 — нет данных
+        self.reserved = np.where(reserved == lookup_codec.encode(RESERVED_YES), 1,
+                                 np.where(reserved == lookup_codec.encode(RESERVED_NO), 0, -1)).astype(np.int8)
+        self.is_system = df['impact_type'].to_numpy() == lookup_codec.encode(SYSTEM_IMPACT_TYPE)
+        self.process_sid = df['process_sid'].to_numpy()
+        self.system_sid = df['system_sid'].to_numpy()
+        self.system_name = df['system_name'].to_numpy()
+
+        self.baseline = self._rate(self.levels)
+
+    def _rate(self, levels):
+        highest, high_count, integral = aggregate_levels(levels, self.starts, self.counts)
+        process_level = np.maximum.reduceat(integral, self.process_starts)
+        return highest, high_count, integral, process_level
+
+    def _match(self, override: dict):
+        """Маска строк АС, попадающих под условия переопределения"""
+        mask = self.is_system & (self.reserved >= 0)
+        if override.get('process_sid') is not None:
+            mask &= self.process_sid == override['process_sid']
+        if override.get('system_sid') is not None:
+            mask &= self.system_sid == lookup_codec.encode(override['system_sid'])
+        if override.get('system_name') is not None:
+            mask &= self.system_name == lookup_codec.encode(override['system_name'])
+        return mask
+
+    def what_if(self, overrides: list) -> dict:
+        """Пересчитывает рейтинги с измененным резервированием АС в РЦОД.
+
+        Каждое переопределение задает условия отбора строк (process_sid, system_sid,
+        system_name) и новое значение as_reserved_in_rcod ('да' или 'нет');
+        более поздние переопределения имеют приоритет. Смена 'нет' -> 'да' снижает
+        уровень риска строки на ступень, 'да' -> 'нет' — повышает. Строки без данных
+        о резервировании не меняются.
+
+        Значения "before" пересчитываются по тому же правилу, что и "after", чтобы
+        разница отражала только переопределения. На импортированных отчетах правило
+        совпадает с сохраненным интегральным уровнем угрозы для 2105 из 2141 угроз
+        (98,3%), поэтому для каждой угрозы возвращается и сохраненный уровень
+        (stored_integral_risk_level), и признак совпадения с ним (matches_stored).
+        """
+        reserved = self.reserved.copy()
+        for override in overrides:
+            reserved[self._match(override)] = 1 if override['as_reserved_in_rcod'] == RESERVED_YES else 0
+
+        shift = self.reserved - reserved
+        levels = np.where(self.levels > 0, np.clip(self.levels + shift, 1, len(LEVELS) - 1), 0).astype(np.int8)
+        highest, high_count, integral, process_level = self._rate(levels)
+        base_highest, base_high_count, base_integral, base_process_level = self.baseline
+
+        def rating(i, level_highest, level_count, level_integral):
+            level = LEVELS[level_integral[i]]
+            return {
+                "integral_risk_level": level,
+                "highest_risk_level": LEVELS[level_highest[i]],
+                "high_risk_count": int(level_count[i]),
+                "total_risk_count": int(self.counts[i]),
+                "color": get_color_for_rating(level),
+            }
+
+        changed = np.flatnonzero(
+            (highest != base_highest) | (high_count != base_high_count) | (integral != base_integral)
+        )
+        changed_processes = np.flatnonzero(process_level != base_process_level)
+        return {
+            "generation": self.generation,
+            "affected_rows": int(np.count_nonzero(shift)),
+            "threats": [
+                {
+                    "process_sid": self.threat_process_sid[i],
+                    "threat_type": self.threat_type[i],
+                    "threat_scenario": self.threat_scenario[i],
+                    "stored_integral_risk_level": self.stored_integral[i],
+                    "matches_stored": self.stored_integral[i] == LEVELS[base_integral[i]],
+                    "before": rating(i, base_highest, base_high_count, base_integral),
+                    "after": rating(i, highest, high_count, integral),
+                }
+                for i in changed
+            ],
+            "processes": [
+                {
+                    "process_sid": self.process_sids[i],
+                    "before": LEVELS[base_process_level[i]],
+                    "after": LEVELS[process_level[i]],
+                }
+                for i in changed_processes
+            ],
+        }
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_rating_engine() -> RatingEngine:
+    """Возвращает движок для текущего поколения данных, перестраивая его после импорта"""
+    global _engine
+    generation = current_generation()
+    rating_engine = _engine
+    if rating_engine is None or rating_engine.generation != generation:
+        with _engine_lock:
+            rating_engine = _engine
+            if rating_engine is None or rating_engine.generation != generation:
+                rating_engine = _engine = RatingEngine(generation)
+    return rating_engine
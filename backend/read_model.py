@@ -0,0 +1,178 @@
+import os
+import sys
+import threading
+from collections import defaultdict
+from sqlalchemy import select
+from database import engine
+from generation import current_generation
+import models
+
+# Модель чтения включается переменной окружения RISKS_READ_MODEL=1
+READ_MODEL_ENABLED = os.environ.get("RISKS_READ_MODEL", "0") == "1"
+
+DEFAULT_COLOR = '#6c757d'  # серый цвет по умолчанию, как в /threats
+
+def record_class(table):
+    """Создает компактный класс записи (__slots__) с колонками таблицы"""
+    names = tuple(column.key for column in table.columns)
+
+    def __init__(self, row):
+        for name, value in zip(names, row):
+            # Повторяющиеся строки (RTO, MTPD, пустые значения) хранятся в одном экземпляре
+            setattr(self, name, sys.intern(value) if type(value) is str else value)
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in names}
+
+    return type(f"{table.name}_record", (), {"__slots__": names, "__init__": __init__, "as_dict": as_dict})
+
+RiskDetailRecord = record_class(models.RiskDetail.__table__)
+DetailedRiskRecord = record_class(models.DetailedRiskReport.__table__)
+RatingRecord = record_class(models.IntegralThreatRating.__table__)
+
+def _load(connection, table, record):
+    # Core-запрос без ORM: словарные колонки декодируются типом LookupString
+    return [record(row) for row in connection.execute(select(table).order_by(table.c.id))]
+
+def _threat_payloads(threats, ratings) -> list:
+    """Повторяет ответ /threats/{process_sid} для одного процесса"""
+    ratings_dict = {
+        ((r.threat_type or '').lower(), (r.threat_scenario or '').lower()): r
+        for r in ratings
+    }
+    unique_threats = {}
+    for threat in threats:
+        unique_threats.setdefault((threat.type, threat.scenario), threat)
+
+    result = []
+    for threat in unique_threats.values():
+        rating = ratings_dict.get(((threat.type or '').lower(), (threat.scenario or '').lower()))
+        result.append({
+            "id": threat.id,
+            "type": threat.type or '',
+            "scenario": threat.scenario or '',
+            "integral_risk_level": threat.integral_risk_level or '',
+            "highest_risk_level": threat.highest_risk_level or '',
+            "process_sid": threat.process_sid or '',
+            "threat_rating": rating.threat_rating if rating else '',
+            "threat_rating_color": rating.color if rating else DEFAULT_COLOR,
+        })
+    return result
+
+def _index(records):
+    by_process = defaultdict(list)
+    by_threat = defaultdict(list)
+    for record in records:
+        by_process[record.process_sid].append(record)
+        by_threat[(record.process_sid, record.threat_type, record.threat_scenario)].append(record)
+    return dict(by_process), dict(by_threat)
+
+def _select(by_process, by_threat, process_sid, threat_type, threat_scenario) -> list:
+    if threat_type is not None and threat_scenario is not None:
+        return by_threat.get((process_sid, threat_type, threat_scenario), [])
+    records = by_process.get(process_sid, [])
+    if threat_type is not None:
+        records = [r for r in records if r.threat_type == threat_type]
+    if threat_scenario is not None:
+        records = [r for r in records if r.threat_scenario == threat_scenario]
+    return records
+
+class ReadModelSnapshot:
+    """Неизменяемый снимок данных для эндпоинтов одного процесса.
+
+    Записи проиндексированы по process_sid, по ключу угрозы
+    (process_sid, тип, сценарий) и по владельцу процесса.
+    """
+
+    __slots__ = (
+        "generation", "owner_processes", "threats", "ratings",
+        "risk_details", "risk_details_by_threat", "detailed", "detailed_by_threat",
+    )
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        # Если во время загрузки пройдет импорт, поколение сменится и снимок будет перестроен
+        with engine.connect() as connection:
+            processes = connection.execute(select(models.Process.sid, models.Process.owner_id)).all()
+            threats = connection.execute(
+                select(models.Threat.__table__).order_by(models.Threat.id)
+            ).all()
+            ratings = _load(connection, models.IntegralThreatRating.__table__, RatingRecord)
+            risk_details = _load(connection, models.RiskDetail.__table__, RiskDetailRecord)
+            detailed = _load(connection, models.DetailedRiskReport.__table__, DetailedRiskRecord)
+
+        owner_processes = defaultdict(set)
+        for sid, owner_id in processes:
+            owner_processes[owner_id].add(sid)
+        self.owner_processes = {owner_id: frozenset(sids) for owner_id, sids in owner_processes.items()}
+
+        self.ratings = defaultdict(list)
+        for rating in ratings:
+            self.ratings[rating.process_sid].append(rating)
+        self.ratings = dict(self.ratings)
+
+        threats_by_process = defaultdict(list)
+        for threat in threats:
+            threats_by_process[threat.process_sid].append(threat)
+        self.threats = {
+            sid: _threat_payloads(process_threats, self.ratings.get(sid, []))
+            for sid, process_threats in threats_by_process.items()
+        }
+
+        self.risk_details, self.risk_details_by_threat = _index(risk_details)
+        self.detailed, self.detailed_by_threat = _index(detailed)
+
+    def owns(self, owner_id: int, process_sid: str) -> bool:
+        return process_sid in self.owner_processes.get(owner_id, ())
+
+    def get_threats(self, process_sid: str) -> list:
+        return self.threats.get(process_sid, [])
+
+    def get_risk_detail(self, process_sid: str, threat_type=None, threat_scenario=None):
+        records = _select(self.risk_details, self.risk_details_by_threat, process_sid, threat_type, threat_scenario)
+        return records[0].as_dict() if records else None
+
+    def get_detailed_risk_report(self, process_sid: str, threat_type=None, threat_scenario=None) -> list:
+        records = _select(self.detailed, self.detailed_by_threat, process_sid, threat_type, threat_scenario)
+        return [record.as_dict() for record in records]
+
+    def get_integral_threat_ratings(self, process_sid: str) -> list:
+        return [record.as_dict() for record in self.ratings.get(process_sid, [])]
+
+# Текущий снимок; читатели берут ссылку без блокировок, перестроение подменяет ее целиком
+_snapshot = None
+_rebuilding = threading.Lock()
+
+def _rebuild() -> None:
+    global _snapshot
+    try:
+        # Поколение читается до загрузки: данные в снимке не старше него
+        generation = current_generation()
+        if _snapshot is None or _snapshot.generation != generation:
+            _snapshot = ReadModelSnapshot(generation)
+    except Exception as e:
+        print(f"Ошибка при построении модели чтения: {e}")
+    finally:
+        _rebuilding.release()
+
+def refresh_read_model(wait: bool = False) -> None:
+    """Запускает перестроение снимка, если оно еще не идет"""
+    if _rebuilding.acquire(blocking=wait):
+        if wait:
+            _rebuild()
+        else:
+            threading.Thread(target=_rebuild, daemon=True).start()
+
+def get_read_model():
+    """Возвращает актуальный снимок или None, если модель выключена или устарела.
+
+    Устаревший снимок не отдается: пока новый строится в фоне,
+    эндпоинты отвечают из SQLite.
+    """
+    if not READ_MODEL_ENABLED:
+        return None
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.generation == current_generation():
+        return snapshot
+    refresh_read_model()
+    return None
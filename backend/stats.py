@@ -0,0 +1,59 @@
+import json
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+import models
+
+# Колонка счетчика в data_meta -> модель, чьи строки она считает
+COUNTERS = {
+    "process_count": models.Process,
+    "threat_count": models.Threat,
+    "risk_detail_count": models.RiskDetail,
+    "detailed_risk_count": models.DetailedRiskReport,
+    "integral_rating_count": models.IntegralThreatRating,
+}
+
+def _table_sizes(db: Session) -> dict:
+    """Размеры таблиц вместе с индексами по данным dbstat; пусто, если dbstat недоступен"""
+    try:
+        rows = db.execute(text(
+            "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat s "
+            "JOIN sqlite_master m ON m.name = s.name GROUP BY m.tbl_name"
+        ))
+        return {name: size for name, size in rows}
+    except OperationalError:
+        return {}
+
+def record_import_stats(db: Session, backfill: bool = False) -> None:
+    """Пересчитывает статистику набора данных в рамках транзакции импорта.
+
+    При backfill=True (заполнение статистики старой базы) время импорта не меняется.
+    """
+    meta = db.get(models.DataMeta, 1)
+    if meta is None:
+        meta = models.DataMeta(id=1, generation=0)
+        db.add(meta)
+    db.flush()
+    for column, model in COUNTERS.items():
+        setattr(meta, column, db.query(model).count())
+    meta.table_sizes = json.dumps(_table_sizes(db))
+    if not backfill:
+        meta.imported_at = datetime.utcnow()
+
+def read_stats(db: Session) -> dict:
+    """Возвращает статистику набора данных одним чтением строки data_meta"""
+    meta = db.get(models.DataMeta, 1)
+    if meta is None:
+        return {
+            "generation": 0,
+            "imported_at": None,
+            "row_counts": {column: 0 for column in COUNTERS},
+            "table_sizes": {},
+        }
+    return {
+        "generation": meta.generation,
+        "imported_at": meta.imported_at,
+        "row_counts": {column: getattr(meta, column) or 0 for column in COUNTERS},
+        "table_sizes": json.loads(meta.table_sizes or "{}"),
+    }